@@ -0,0 +1,31 @@
+import json
+from dataclasses import dataclass
+from typing import Dict
+
+from atomic_write import write_bytes_if_changed
+from paths import API_CACHE
+
+
+@dataclass(frozen=True, slots=True)
+class ApiCacheEntry:
+    etag: str
+    body: str
+    fetched_at: float = 0.0
+
+
+def parse_api_cache() -> Dict[str, ApiCacheEntry]:
+    try:
+        with open(API_CACHE, "r", encoding="utf-8") as json_file:
+            json_dict = json.load(json_file)
+
+        return {url: ApiCacheEntry(**entry) for url, entry in json_dict.items()}
+    except FileNotFoundError:
+        return {}
+
+
+def save_api_cache(api_cache: Dict[str, ApiCacheEntry]) -> None:
+    json_dict = {
+        url: {"etag": entry.etag, "body": entry.body, "fetched_at": entry.fetched_at}
+        for url, entry in api_cache.items()
+    }
+    write_bytes_if_changed(API_CACHE, json.dumps(json_dict).encode("utf-8"))
@@ -0,0 +1,17 @@
+import logging
+import os
+from pathlib import Path
+
+
+def write_bytes_if_changed(path: Path, data: bytes) -> None:
+    try:
+        if path.read_bytes() == data:
+            logging.info("`%s` is unchanged", path)
+            return
+    except FileNotFoundError:
+        pass
+
+    temp_path = path.with_name(f"{path.name}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+    logging.info("Saved `%s`", path)
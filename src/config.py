@@ -1,54 +1,94 @@
 import logging
-import re
+import os
+import tomllib
+from dataclasses import dataclass, field, fields
 from typing import Any, Dict, List, Optional
 
-import toml
-
 from downloader import DownloaderInitError, create_downloader
 from paths import DOWNLOADS_TOML, GITHUB_TOKEN
 from section import Section, SectionItem
 from section_id import get_section_id
 
 
-def parse_downloads_toml() -> List[Section]:
-    with open(DOWNLOADS_TOML, "r", encoding="utf-8") as toml_file:
-        toml_string = toml_file.read()
+@dataclass(frozen=True, slots=True)
+class _DownloaderConfig:
+    repo: Optional[str] = None
+    asset_name: Optional[str] = None
+    asset_regex: Optional[str] = None
+    file: Optional[str] = None
+    url: Optional[str] = None
+    remove: List[str] = field(default_factory=list)
+
+
+_DOWNLOADER_CONFIG_KEYS = frozenset(f.name for f in fields(_DownloaderConfig))
+
+
+def _parse_downloader_config(d_data: Any) -> _DownloaderConfig:
+    if not isinstance(d_data, dict):
+        raise RuntimeError("Expected a table")
+
+    for key, value in d_data.items():
+        if key not in _DOWNLOADER_CONFIG_KEYS:
+            raise RuntimeError(f"Unknown key `{key}`")
+
+        if key == "remove":
+            if not isinstance(value, list) or not all(
+                isinstance(item, str) for item in value
+            ):
+                raise RuntimeError("`remove` must be an array of strings")
+        elif not isinstance(value, str):
+            raise RuntimeError(f"`{key}` must be a string")
 
-    toml_dict: Dict[str, List[Dict[str, Any]]] = toml.loads(toml_string)
+    return _DownloaderConfig(**d_data)
+
+
+def parse_downloads_toml() -> List[Section]:
+    with open(DOWNLOADS_TOML, "rb") as toml_file:
+        toml_dict: Dict[str, Any] = tomllib.load(toml_file)
 
     section_list: List[Section] = []
     for s_name, s_data in toml_dict.items():
+        section_id = get_section_id(s_name)
+
+        if not isinstance(s_data, list):
+            raise DownloaderInitError("Expected an array of tables", s_name)
+
         asset_list: List[SectionItem] = []
         for d_data in s_data:
             try:
+                d_config = _parse_downloader_config(d_data)
                 downloader = create_downloader(
-                    d_data.get("repo"),
-                    d_data.get("asset_name"),
-                    d_data.get("asset_regex"),
-                    d_data.get("file"),
-                    d_data.get("url"),
+                    d_config.repo,
+                    d_config.asset_name,
+                    d_config.asset_regex,
+                    d_config.file,
+                    d_config.url,
                 )
             except RuntimeError as err:
                 raise DownloaderInitError(str(err), s_name) from None
 
-            asset_list.append(
-                SectionItem(
-                    downloader,
-                    d_data.get("remove", []),
-                )
-            )
+            asset_list.append(SectionItem(downloader, d_config.remove))
 
-        section_list.append(Section(get_section_id(s_name), asset_list))
+        section_list.append(Section(section_id, asset_list))
 
     return section_list
 
 
 def get_github_token() -> Optional[str]:
-    with open(GITHUB_TOKEN, "r", encoding="utf-8") as token_file:
-        token = token_file.read().strip()
+    token = os.environ.get("GITHUB_TOKEN", "").strip() or None
+
+    if token is None:
+        try:
+            with open(GITHUB_TOKEN, "r", encoding="utf-8") as token_file:
+                token = token_file.read()
+        except FileNotFoundError:
+            logging.warning("No GitHub token found, using the unauthenticated API")
+            return None
+
+    token = token.strip()
 
-    if re.match(r"^ghp_[a-zA-Z0-9]{36}$", token):
-        return token
+    if not token:
+        logging.warning("Empty GitHub token, using the unauthenticated API")
+        return None
 
-    logging.warning("Invalid GitHub token `%s`", token)
-    return None
+    return token
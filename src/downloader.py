@@ -1,15 +1,89 @@
+import hashlib
 import logging
+import os
+import posixpath
 import re
 import shutil
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import timezone
+from email.message import Message
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
-from urllib.parse import unquote, urlparse, urlunparse
+from tempfile import mkdtemp
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Set, Union
+from urllib.parse import unquote, urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+json_loads: Callable[[Union[bytes, str]], Any]
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:
+    import json
+
+    json_loads = json.loads
+
+from api_cache import ApiCacheEntry
 from downloader_lock import DownloaderLock
-from paths import DOWNLOADS_TEMP_PATH
+from file_cache import FileCacheEntry, get_cached_file_folder
+from output import OUTPUT_LOGGER_NAME
+from paths import get_downloads_temp_path
+from rate_limit import TokenBucket
+
+MAX_DOWNLOAD_WORKERS = 8
+_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+_MAX_API_REQUESTS = 5
+_MAX_RATE_LIMIT_RETRIES = 3
+_MAX_RATE_LIMIT_WAIT = 60
+_API_REQUESTS_PER_SECOND = 10
+_HTTP_TIMEOUT = (5, 30)
+
+_OUTPUT = logging.getLogger(OUTPUT_LOGGER_NAME)
+
+_API_SEMAPHORE = threading.BoundedSemaphore(_MAX_API_REQUESTS)
+_API_RATE_LIMITER = TokenBucket(_API_REQUESTS_PER_SECOND, _API_REQUESTS_PER_SECOND)
+_cache_ttl: float = 0
+_rate_limit_reset_at: float = 0
+_LOCK_LIST_MUTEX = threading.Lock()
+
+_HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=MAX_DOWNLOAD_WORKERS,
+    pool_block=True,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[500, 502, 503, 504],
+        raise_on_status=False,
+    ),
+)
+
+_GITHUB_API_HEADERS = {
+    "Accept": "application/vnd.github+json",
+    "X-GitHub-Api-Version": "2022-11-28",
+}
+_DOWNLOAD_HEADERS = {"cache-control": "no-cache", "Accept-Encoding": "identity"}
+
+_SESSION = requests.Session()
+_SESSION.headers.update({"User-Agent": "Switch-Updater"})
+_SESSION.mount("https://", _HTTP_ADAPTER)
+_SESSION.mount("http://", _HTTP_ADAPTER)
+
+
+def close_http_session() -> None:
+    _SESSION.close()
+
+
+def set_cache_ttl(seconds: float) -> None:
+    global _cache_ttl
+    _cache_ttl = seconds
 
 
 class DownloadError(RuntimeError):
@@ -22,90 +96,334 @@ class DownloaderInitError(RuntimeError):
         super().__init__(f"{message} in table array `{table_name}`")
 
 
-def _github_api_request(url: str, token: Optional[str]) -> Optional[Dict[str, Any]]:
-    if token is not None:
-        headers = {
-            "Accept": "application/vnd.github+json",
-            "Authorization": f"Bearer {token}",
-            "X-GitHub-Api-Version": "2022-11-28",
-        }
+_API_RESPONSES_MUTEX = threading.Lock()
+_API_RESPONSE_MUTEXES: Dict[str, threading.Lock] = {}
+_API_RESPONSES: Dict[str, Union[bytes, str]] = {}
+
+
+def _parse_retry_after(retry_after: str) -> Optional[float]:
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    return retry_at.timestamp() - time.time()
+
+
+def _get_rate_limit_wait(response: requests.Response, attempt: int) -> Optional[float]:
+    if response.status_code not in (403, 429):
+        return None
+
+    retry_after = response.headers.get("Retry-After")
+    retry_after_wait = _parse_retry_after(retry_after) if retry_after else None
+    rate_limit_reset = response.headers.get("X-RateLimit-Reset")
+
+    if retry_after_wait is not None:
+        wait = retry_after_wait
+    elif response.headers.get("X-RateLimit-Remaining") == "0" and rate_limit_reset:
+        wait = float(rate_limit_reset) - time.time()
+    elif response.status_code == 429:
+        wait = 0
     else:
-        headers = None
+        return None
+
+    wait = max(wait, 2**attempt)
+    return wait if wait <= _MAX_RATE_LIMIT_WAIT else None
+
+
+def _record_rate_limit(response: requests.Response) -> None:
+    global _rate_limit_reset_at
+
+    rate_limit_remaining = response.headers.get("X-RateLimit-Remaining")
+    rate_limit_reset = response.headers.get("X-RateLimit-Reset")
+    logging.debug("GitHub API rate limit remaining: %s", rate_limit_remaining)
+
+    if rate_limit_remaining == "0" and rate_limit_reset is not None:
+        _rate_limit_reset_at = max(_rate_limit_reset_at, float(rate_limit_reset))
+
+
+def _request_github_api(
+    url: str, api_cache: Dict[str, ApiCacheEntry], token: Optional[str]
+) -> Optional[Union[bytes, str]]:
+    headers = dict(_GITHUB_API_HEADERS)
+
+    if token is not None:
+        headers["Authorization"] = f"Bearer {token}"
 
-    response = requests.get(url=url, headers=headers, timeout=5)
+    cached_entry = api_cache.get(url)
+
+    if cached_entry is not None:
+        if time.time() - cached_entry.fetched_at < _cache_ttl:
+            logging.info("Using cached response for `%s` without revalidating", url)
+            return cached_entry.body
+
+        headers["If-None-Match"] = cached_entry.etag
+
+    rate_limit_reset_wait = _rate_limit_reset_at - time.time()
+
+    if rate_limit_reset_wait > _MAX_RATE_LIMIT_WAIT:
+        if cached_entry is not None:
+            logging.warning(
+                "GitHub API rate limit exhausted, using cached response for `%s`",
+                url,
+            )
+            return cached_entry.body
+
+        _OUTPUT.error(
+            "GitHub API rate limit exhausted, resets in %.0f seconds",
+            rate_limit_reset_wait,
+        )
+        return None
+
+    if rate_limit_reset_wait > 0:
+        logging.warning(
+            "GitHub API rate limit exhausted, waiting %.0f seconds",
+            rate_limit_reset_wait,
+        )
+        time.sleep(rate_limit_reset_wait)
+
+    with _API_SEMAPHORE:
+        for attempt in range(_MAX_RATE_LIMIT_RETRIES + 1):
+            _API_RATE_LIMITER.acquire()
+            response = _SESSION.get(url=url, headers=headers, timeout=_HTTP_TIMEOUT)
+            _record_rate_limit(response)
+            rate_limit_wait = _get_rate_limit_wait(response, attempt)
+
+            if rate_limit_wait is None or attempt == _MAX_RATE_LIMIT_RETRIES:
+                break
+
+            logging.warning(
+                "GitHub API rate limit hit, retrying `%s` in %.0f seconds",
+                url,
+                rate_limit_wait,
+            )
+            time.sleep(rate_limit_wait)
+
+    if response.status_code == 304 and cached_entry is not None:
+        logging.info("Using cached response for `%s`", url)
+        api_cache[url] = replace(cached_entry, fetched_at=time.time())
+        return cached_entry.body
 
     if response.status_code != 200:
-        print(f"GitHub API Request failed. Status code: {response.status_code}")
+        _OUTPUT.error(
+            "GitHub API Request failed. Status code: %s", response.status_code
+        )
         return None
 
-    return response.json()
+    etag = response.headers.get("ETag")
+
+    if etag is not None:
+        api_cache[url] = ApiCacheEntry(
+            etag, response.content.decode("utf-8"), time.time()
+        )
+
+    return response.content
+
 
+def _github_api_get(
+    url: str, api_cache: Dict[str, ApiCacheEntry], token: Optional[str]
+) -> Optional[Union[bytes, str]]:
+    with _API_RESPONSES_MUTEX:
+        url_mutex = _API_RESPONSE_MUTEXES.setdefault(url, threading.Lock())
 
-def _get_latest_release(repo: str, token: Optional[str]) -> Optional[Dict[str, Any]]:
+    with url_mutex:
+        body = _API_RESPONSES.get(url)
+
+        if body is None:
+            body = _request_github_api(url, api_cache, token)
+
+            if body is not None:
+                _API_RESPONSES[url] = body
+
+    return body
+
+
+def _get_latest_release(
+    repo: str, api_cache: Dict[str, ApiCacheEntry], token: Optional[str]
+) -> Optional[Union[bytes, str]]:
     url = f"https://api.github.com/repos/{repo}/releases/latest"
-    return _github_api_request(url, token)
+    return _github_api_get(url, api_cache, token)
+
+
+def _preallocate_file(file: BinaryIO, response: requests.Response) -> None:
+    content_length = response.headers.get("Content-Length")
+
+    if not hasattr(os, "posix_fallocate") or content_length is None:
+        return
+
+    try:
+        os.posix_fallocate(file.fileno(), 0, int(content_length))
+    except (OSError, ValueError) as err:
+        logging.debug("Unable to preallocate `%s`: %s", file.name, err)
+
+
+def _write_response_to(file_path: Path, response: requests.Response) -> str:
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    part_file_path = file_path.with_name(f"{file_path.name}.part")
+    file_hash = hashlib.sha256()
+
+    try:
+        with open(part_file_path, "wb") as file:
+            _preallocate_file(file, response)
 
+            for chunk in response.iter_content(chunk_size=_DOWNLOAD_CHUNK_SIZE):
+                file.write(chunk)
+                file_hash.update(chunk)
 
-def _get_default_branch(repo: str, token: Optional[str]) -> Optional[str]:
-    url = f"https://api.github.com/repos/{repo}"
-    response = _github_api_request(url, token)
-    return response.get("default_branch") if response is not None else None
+            file.truncate()
+    except BaseException:
+        part_file_path.unlink(missing_ok=True)
+        raise
 
+    os.replace(part_file_path, file_path)
+    return file_hash.hexdigest()
 
-def _download_file_to(target_path: Path, url: str) -> Optional[Path]:
-    filename = _get_file_name_from_url(url)
+
+def _download_file_to(
+    target_path: Path,
+    url: str,
+    filename: Optional[str] = None,
+    expected_sha256: Optional[str] = None,
+) -> Optional[Path]:
+    url_filename = _get_file_name_from_url(url)
 
     try:
-        response = requests.get(url, timeout=10, headers={"cache-control": "no-cache"})
+        with _SESSION.get(
+            url, stream=True, timeout=_HTTP_TIMEOUT, headers=_DOWNLOAD_HEADERS
+        ) as response:
+            if response.status_code != 200:
+                _OUTPUT.error(
+                    "Failed to download `%s`. Status code: %s",
+                    url_filename,
+                    response.status_code,
+                )
+                return None
+
+            if filename is None:
+                filename = _get_file_name_from_response(response, url_filename)
+
+            file_path = target_path / filename
+            file_sha256 = _write_response_to(file_path, response)
+
+            if expected_sha256 is not None and file_sha256 != expected_sha256:
+                shutil.rmtree(target_path, ignore_errors=True)
+                _OUTPUT.error("Checksum mismatch for `%s`", filename)
+                return None
+
+            return file_path
     except requests.exceptions.RequestException as err:
-        raise DownloadError(filename, err) from None
+        raise DownloadError(url_filename, err) from None
 
-    if response.status_code != 200:
-        print(f"Failed to download `{filename}`. Status code: {response.status_code}")
-        return None
 
-    target_path.mkdir(parents=True, exist_ok=True)
+def _download_cached_file(
+    url: str, file_cache: Dict[str, FileCacheEntry]
+) -> Optional[Path]:
+    url_filename = _get_file_name_from_url(url)
+    cached_folder = get_cached_file_folder(url)
+    cached_entry = file_cache.get(url)
+    headers = dict(_DOWNLOAD_HEADERS)
+
+    if cached_entry is not None:
+        cached_file_path = cached_folder / cached_entry.file_name
 
-    file_path = target_path / filename
-    with open(file_path, "wb") as file:
-        file.write(response.content)
-        return file_path
+        if not cached_file_path.is_file():
+            cached_entry = None
+        elif time.time() - cached_entry.fetched_at < _cache_ttl:
+            logging.info("Using cached file for `%s` without revalidating", url)
+            return cached_file_path
+        else:
+            if cached_entry.etag is not None:
+                headers["If-None-Match"] = cached_entry.etag
+            if cached_entry.last_modified is not None:
+                headers["If-Modified-Since"] = cached_entry.last_modified
+
+    try:
+        with _SESSION.get(
+            url, stream=True, timeout=_HTTP_TIMEOUT, headers=headers
+        ) as response:
+            if response.status_code == 304 and cached_entry is not None:
+                logging.info("`%s` not modified, using cached file", url)
+                file_cache[url] = replace(cached_entry, fetched_at=time.time())
+                return cached_file_path
+
+            if response.status_code != 200:
+                _OUTPUT.error(
+                    "Failed to download `%s`. Status code: %s",
+                    url_filename,
+                    response.status_code,
+                )
+                return None
+
+            file_cache.pop(url, None)
+            if cached_folder.exists():
+                shutil.rmtree(cached_folder)
+
+            filename = _get_file_name_from_response(response, url_filename)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+            if etag is None and last_modified is None:
+                file_path = Path(mkdtemp(dir=get_downloads_temp_path())) / filename
+                _write_response_to(file_path, response)
+                return file_path
+
+            file_path = cached_folder / filename
+            _write_response_to(file_path, response)
+            file_cache[url] = FileCacheEntry(filename, etag, last_modified, time.time())
+
+            return file_path
+    except requests.exceptions.RequestException as err:
+        raise DownloadError(url_filename, err) from None
+
+
+def _get_file_name_from_response(response: requests.Response, default: str) -> str:
+    content_disposition = response.headers.get("Content-Disposition")
+
+    if content_disposition is not None:
+        message = Message()
+        message["Content-Disposition"] = content_disposition
+        filename = message.get_filename()
+
+        if filename is not None and Path(filename).name not in ("", ".", ".."):
+            return Path(filename).name
+
+    return default
 
 
 def _get_file_name_from_url(url: str) -> str:
-    parsed_url = urlparse(unquote(url))
-    path_url = urlunparse(
-        (
-            parsed_url.scheme,
-            parsed_url.netloc,
-            parsed_url.path,
-            "",
-            "",
-            "",
-        )
-    )
-    return Path(path_url).name
+    return posixpath.basename(unquote(urlsplit(url).path).rstrip("/"))
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
+class DownloadContext:
+    lock_index: Dict[str, List[DownloaderLock]]
+    api_cache: Dict[str, ApiCacheEntry]
+    file_cache: Dict[str, FileCacheEntry]
+    token: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
 class GithubFile:
     _repo: str
     _file: str
 
-    def download(
-        self,
-        token: Optional[str],
-    ) -> Optional[Path]:
-        print(f"\t{self._repo}: {Path(self._file).name}")
+    def file_cache_url(self) -> str:
+        return f"https://raw.githubusercontent.com/{self._repo}/HEAD/{self._file}"
 
-        default_branch = _get_default_branch(self._repo, token)
+    def download(self, context: DownloadContext) -> Optional[Path]:
+        _OUTPUT.info("\t%s: %s", self._repo, Path(self._file).name)
 
-        if default_branch is None:
-            print(f"Unable to get default branch for `{self._repo}`")
-            return None
-
-        url = f"https://raw.githubusercontent.com/{self._repo}/{default_branch}/{self._file}"
-        downloaded_file_path = _download_file_to(DOWNLOADS_TEMP_PATH, url)
+        downloaded_file_path = _download_cached_file(
+            self.file_cache_url(), context.file_cache
+        )
 
         if downloaded_file_path is not None:
             logging.info("File downloaded to `%s`", downloaded_file_path)
@@ -113,53 +431,67 @@ class GithubFile:
         return downloaded_file_path
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class GithubAsset:
     _repo: str
     _asset_name: Optional[str]
-    _asset_regex: Optional[str]
+    _asset_regex: Optional[re.Pattern[str]]
+
+    def _matches(self, asset_name: str) -> bool:
+        if self._asset_name is not None:
+            return asset_name == self._asset_name
+
+        return (
+            self._asset_regex is not None
+            and self._asset_regex.search(asset_name) is not None
+        )
 
     def _get_asset(self, assets: Any) -> Optional[Any]:
         for asset in assets:
-            asset_name: str = asset["name"]
-
-            if self._asset_name is not None:
-                if asset_name == self._asset_name:
-                    return asset
-            elif self._asset_regex is not None:
-                if re.search(self._asset_regex, asset_name) is not None:
-                    return asset
+            if self._matches(asset["name"]):
+                return asset
 
         return None
 
     def _get_cached_lock(
-        self, lock_list: List[DownloaderLock]
+        self,
+        lock_index: Dict[str, List[DownloaderLock]],
+        asset_name: str,
+        release_asset_names: Set[str],
     ) -> Optional[DownloaderLock]:
-        for lock in lock_list:
-            if lock.repo == self._repo:
-                if self._asset_name is not None:
-                    if lock.asset_name == self._asset_name:
-                        return lock
-                elif self._asset_regex is not None:
-                    if re.search(self._asset_regex, lock.asset_name) is not None:
-                        return lock
+        repo_locks = lock_index.get(self._repo, [])
+
+        for lock in repo_locks:
+            if lock.asset_name == asset_name:
+                return lock
+
+        for lock in repo_locks:
+            if lock.asset_name not in release_asset_names and self._matches(
+                lock.asset_name
+            ):
+                return lock
+
         return None
 
-    def download(
-        self,
-        lock_list: List[DownloaderLock],
-        token: Optional[str],
-    ) -> Optional[Path]:
-        latest_release = _get_latest_release(self._repo, token)
+    def file_cache_url(self) -> Optional[str]:
+        return None
+
+    def download(self, context: DownloadContext) -> Optional[Path]:
+        lock_index = context.lock_index
+        latest_release_body = _get_latest_release(
+            self._repo, context.api_cache, context.token
+        )
 
-        if latest_release is None:
-            print(f"Unable to get latest release for `{self._repo}`")
+        if latest_release_body is None:
+            _OUTPUT.error("Unable to get latest release for `%s`", self._repo)
             return None
 
+        latest_release = json_loads(latest_release_body)
+
         asset = self._get_asset(latest_release["assets"])
 
         if asset is None:
-            print(f"Unable to get matching asset for `{self._repo}`")
+            _OUTPUT.error("Unable to get matching asset for `%s`", self._repo)
             return None
 
         asset_name = asset["name"]
@@ -169,45 +501,70 @@ class GithubAsset:
             asset_name,
             asset["updated_at"],
         )
-        cached_lock = self._get_cached_lock(lock_list)
 
-        if cached_lock is not None:
-            cached_asset_path = cached_lock.cached_asset_path()
+        release_asset_names = {
+            release_asset["name"] for release_asset in latest_release["assets"]
+        }
 
-            if cached_lock == current_lock:
-                print(f"\t{self._repo}: Already up to date")
-                return cached_asset_path
+        with _LOCK_LIST_MUTEX:
+            cached_lock = self._get_cached_lock(
+                lock_index, asset_name, release_asset_names
+            )
 
-            shutil.rmtree(cached_asset_path.parent)
-            logging.info("Removed `%s`", cached_asset_path.parent)
+            is_up_to_date = (
+                cached_lock == current_lock
+                and current_lock.cached_asset_path().is_file()
+            )
 
-            lock_list.remove(cached_lock)
+            if cached_lock is not None and not is_up_to_date:
+                lock_index[self._repo].remove(cached_lock)
 
-        print(f"\t{self._repo}: {asset_name}")
+        if is_up_to_date:
+            _OUTPUT.info("\t%s: Already up to date", self._repo)
+            return current_lock.cached_asset_path()
+
+        if cached_lock is not None:
+            cached_asset_folder = cached_lock.cached_asset_path().parent
+
+            if cached_asset_folder.exists():
+                shutil.rmtree(cached_asset_folder)
+                logging.info("Removed `%s`", cached_asset_folder)
+
+        _OUTPUT.info("\t%s: %s", self._repo, asset_name)
 
         url = asset["browser_download_url"]
+        digest: Optional[str] = asset.get("digest")
+        expected_sha256 = (
+            digest.removeprefix("sha256:").lower()
+            if digest is not None and digest.startswith("sha256:")
+            else None
+        )
 
+        asset_path = current_lock.cached_asset_path()
         downloaded_file_path = _download_file_to(
-            current_lock.cached_asset_path().parent, url
+            asset_path.parent, url, asset_path.name, expected_sha256
         )
 
         if downloaded_file_path is not None:
             logging.info("File downloaded to `%s`", downloaded_file_path)
-            lock_list.append(current_lock)
+
+            with _LOCK_LIST_MUTEX:
+                lock_index.setdefault(self._repo, []).append(current_lock)
 
         return downloaded_file_path
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class RawUrl:
     _url: str
 
-    def download(
-        self,
-    ) -> Optional[Path]:
-        print(f"\t{_get_file_name_from_url(self._url)}")
+    def file_cache_url(self) -> str:
+        return self._url
 
-        downloaded_file_path = _download_file_to(DOWNLOADS_TEMP_PATH, self._url)
+    def download(self, context: DownloadContext) -> Optional[Path]:
+        _OUTPUT.info("\t%s", _get_file_name_from_url(self._url))
+
+        downloaded_file_path = _download_cached_file(self._url, context.file_cache)
 
         if downloaded_file_path is not None:
             logging.info("File downloaded to `%s`", downloaded_file_path)
@@ -215,25 +572,15 @@ class RawUrl:
         return downloaded_file_path
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Downloader:
     _downloader_type: Union[GithubFile, GithubAsset, RawUrl]
 
-    def download(
-        self,
-        lock_list: List[DownloaderLock],
-        token: Optional[str],
-    ) -> Optional[Path]:
-        if isinstance(self._downloader_type, GithubAsset):
-            downloaded_file_path = self._downloader_type.download(lock_list, token)
-        elif isinstance(self._downloader_type, GithubFile):
-            downloaded_file_path = self._downloader_type.download(token)
-        elif isinstance(self._downloader_type, RawUrl):
-            downloaded_file_path = self._downloader_type.download()
-        else:
-            raise AssertionError("This branch should be unreachable.")
+    def file_cache_url(self) -> Optional[str]:
+        return self._downloader_type.file_cache_url()
 
-        return downloaded_file_path
+    def download(self, context: DownloadContext) -> Optional[Path]:
+        return self._downloader_type.download(context)
 
 
 def create_downloader(
@@ -243,28 +590,33 @@ def create_downloader(
     file: Optional[str],
     url: Optional[str],
 ) -> Downloader:
-    if (repo is None) == (url is None):
+    repo_selector_count = sum(
+        value is not None for value in (asset_name, asset_regex, file)
+    )
+
+    if url is not None:
+        if repo is not None:
+            raise RuntimeError("Either `repo` or `url` must be provided")
+
+        if repo_selector_count > 0:
+            raise RuntimeError("`url` must be provided alone")
+
+        return Downloader(RawUrl(url))
+
+    if repo is None:
         raise RuntimeError("Either `repo` or `url` must be provided")
 
-    if (repo is not None) and (
-        (asset_name is None) == (asset_regex is None) == (file is None)
-    ):
+    if repo_selector_count != 1:
         raise RuntimeError(
-            "Either `asset_name`, `asset_regex` or `file` must be provided"
+            "Exactly one of `asset_name`, `asset_regex` or `file` must be provided"
         )
 
-    if (url is not None) and (
-        asset_name is not None or asset_regex is not None or file is not None
-    ):
-        raise RuntimeError("`url` must be provided alone")
-
-    if repo and (asset_name or asset_regex):
-        return Downloader(GithubAsset(repo, asset_name, asset_regex))
-
-    if repo and file:
+    if file is not None:
         return Downloader(GithubFile(repo, file))
 
-    if url:
-        return Downloader(RawUrl(url))
+    try:
+        asset_pattern = re.compile(asset_regex) if asset_regex is not None else None
+    except re.error as err:
+        raise RuntimeError(f"Invalid `asset_regex`: {err}") from None
 
-    raise AssertionError("This branch should be unreachable.")
+    return Downloader(GithubAsset(repo, asset_name, asset_pattern))
@@ -1,14 +1,16 @@
 import hashlib
+import tomllib
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
-import toml
+import tomli_w
 
+from atomic_write import write_bytes_if_changed
 from paths import DOWNLOADS_CACHE_PATH, DOWNLOADS_LOCK
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class DownloaderLock:
     repo: str
     tag_name: str
@@ -23,19 +25,22 @@ class DownloaderLock:
         return DOWNLOADS_CACHE_PATH / identifier_hash / self.asset_name
 
 
-def parse_downloads_lock() -> List[DownloaderLock]:
+def parse_downloads_lock() -> Dict[str, List[DownloaderLock]]:
     try:
-        with open(DOWNLOADS_LOCK, "r", encoding="utf-8") as toml_file:
-            toml_string = toml_file.read()
+        with open(DOWNLOADS_LOCK, "rb") as toml_file:
+            toml_dict = tomllib.load(toml_file)
+    except FileNotFoundError:
+        return {}
 
-        toml_dict = toml.loads(toml_string)
+    lock_index: Dict[str, List[DownloaderLock]] = {}
+    for lock_data in toml_dict.get("package", []):
+        lock = DownloaderLock(**lock_data)
+        lock_index.setdefault(lock.repo, []).append(lock)
 
-        return [DownloaderLock(**lock) for lock in toml_dict.get("package", [])]
-    except FileNotFoundError:
-        return []
+    return lock_index
 
 
-def save_downloads_lock(lock_list: List[DownloaderLock]) -> None:
+def save_downloads_lock(lock_index: Dict[str, List[DownloaderLock]]) -> None:
     packages_list = [
         {
             "repo": lock.repo,
@@ -43,11 +48,9 @@ def save_downloads_lock(lock_list: List[DownloaderLock]) -> None:
             "asset_name": lock.asset_name,
             "asset_updated_at": lock.asset_updated_at,
         }
-        for lock in lock_list
+        for repo_locks in lock_index.values()
+        for lock in repo_locks
     ]
 
     toml_dict = {"package": packages_list}
-    toml_string = toml.dumps(toml_dict)
-
-    with open(DOWNLOADS_LOCK, "w", encoding="utf-8") as toml_file:
-        toml_file.write(toml_string)
+    write_bytes_if_changed(DOWNLOADS_LOCK, tomli_w.dumps(toml_dict).encode("utf-8"))
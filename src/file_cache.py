@@ -0,0 +1,70 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from atomic_write import write_bytes_if_changed
+from paths import DOWNLOADS_CACHE_PATH, FILE_CACHE
+
+_FILES_CACHE_PATH = DOWNLOADS_CACHE_PATH / "files"
+
+
+@dataclass(frozen=True, slots=True)
+class FileCacheEntry:
+    file_name: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float = 0.0
+
+
+def get_cached_file_folder(url: str) -> Path:
+    url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return _FILES_CACHE_PATH / url_hash
+
+
+def parse_file_cache() -> Dict[str, FileCacheEntry]:
+    try:
+        with open(FILE_CACHE, "r", encoding="utf-8") as json_file:
+            json_dict = json.load(json_file)
+
+        return {url: FileCacheEntry(**entry) for url, entry in json_dict.items()}
+    except FileNotFoundError:
+        return {}
+
+
+def prune_file_cache(file_cache: Dict[str, FileCacheEntry], urls: Set[str]) -> None:
+    for url in file_cache.keys() - urls:
+        del file_cache[url]
+
+    url_hashes = {get_cached_file_folder(url).name for url in urls}
+
+    try:
+        with os.scandir(_FILES_CACHE_PATH) as entries:
+            stale_paths = [
+                entry.path
+                for entry in entries
+                if entry.is_dir(follow_symlinks=False) and entry.name not in url_hashes
+            ]
+    except FileNotFoundError:
+        return
+
+    for stale_path in stale_paths:
+        shutil.rmtree(stale_path)
+        logging.info("Removed `%s`", stale_path)
+
+
+def save_file_cache(file_cache: Dict[str, FileCacheEntry]) -> None:
+    json_dict = {
+        url: {
+            "file_name": entry.file_name,
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "fetched_at": entry.fetched_at,
+        }
+        for url, entry in file_cache.items()
+    }
+    write_bytes_if_changed(FILE_CACHE, json.dumps(json_dict).encode("utf-8"))
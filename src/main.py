@@ -1,30 +1,142 @@
+import errno
+import glob
+import hashlib
 import logging
+import os
 import re
 import shutil
+import stat
 from argparse import ArgumentParser, ArgumentTypeError
-from pathlib import Path
-from typing import List, Optional, Union
-from zipfile import ZipFile
-
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import repeat
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Set, Union
+from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
+
+from api_cache import parse_api_cache, save_api_cache
 from config import get_github_token, parse_downloads_toml
-from downloader import DownloadError
-from downloader_lock import DownloaderLock, parse_downloads_lock, save_downloads_lock
+from downloader import (
+    MAX_DOWNLOAD_WORKERS,
+    DownloadContext,
+    Downloader,
+    close_http_session,
+    set_cache_ttl,
+)
+from downloader_lock import parse_downloads_lock, save_downloads_lock
+from file_cache import parse_file_cache, prune_file_cache, save_file_cache
+from output import OUTPUT_LOGGER_NAME, setup_output_logger
 from paths import (
     BASE_PATH,
     DOWNLOADS_CACHE_PATH,
     DOWNLOADS_LOCK,
-    DOWNLOADS_TEMP_PATH,
     PC_SAVE_PATH,
     ROOT_SAVE_PATH,
     SAVE_PATHS,
 )
 from section import Section
-from section_id import SectionId
+from section_id import SectionId, get_section_id
+
+_OUTPUT = logging.getLogger(OUTPUT_LOGGER_NAME)
+
+_EXTRACT_ZIP_WORKERS = min(8, os.cpu_count() or 1)
+_PACK_COMPRESS_LEVEL = 1
+_NON_ROOT_ZIP_FOLDERS = ("sd/", "sdout/")
+_HEKATE_PAYLOAD_PATTERN = re.compile(r"hekate_ctcaer_(?:\d+\.\d+\.\d+)\.bin")
+
+_used_extracted_zip_paths: Set[Path] = set()
+
+
+def _get_zip_member_path(target_path: Path, member: ZipInfo) -> Path:
+    return target_path.joinpath(
+        *(
+            part
+            for part in PurePosixPath(member.filename).parts
+            if part not in ("/", ".", "..")
+        )
+    )
+
+
+def _get_zip_member_folder(target_path: Path, member: ZipInfo) -> Path:
+    member_path = _get_zip_member_path(target_path, member)
+    return member_path if member.is_dir() else member_path.parent
+
+
+def _extract_zip_members(
+    zip_path: Path, members: List[ZipInfo], target_path: Path
+) -> None:
+    with ZipFile(zip_path, "r") as zip_file:
+        for member in members:
+            try:
+                os.unlink(_get_zip_member_path(target_path, member))
+            except FileNotFoundError:
+                pass
+
+            zip_file.extract(member, target_path)
+
+
+def _extract_zip(zip_path: Path, members: List[ZipInfo], target_path: Path) -> None:
+    for folder in {_get_zip_member_folder(target_path, member) for member in members}:
+        folder.mkdir(parents=True, exist_ok=True)
+
+    file_members = [member for member in members if not member.is_dir()]
+    worker_count = max(1, min(_EXTRACT_ZIP_WORKERS, len(file_members)))
+    member_groups = [file_members[i::worker_count] for i in range(worker_count)]
+
+    with ThreadPoolExecutor(max_workers=worker_count) as executor:
+        for _ in executor.map(
+            _extract_zip_members,
+            repeat(zip_path),
+            member_groups,
+            repeat(target_path),
+        ):
+            pass
+
+    logging.info("Zip file `%s` extracted to `%s`", zip_path, target_path)
 
 
-def _extract_zip(zip_file: ZipFile, members: Optional[List[str]], target_path: Path):
-    zip_file.extractall(target_path, members)
-    logging.info("Zip file `%s` extracted to `%s`", zip_file.filename, target_path)
+def _get_extracted_zip_path(zip_path: Path, to_remove: List[str]) -> Path:
+    to_remove_hash = hashlib.sha256("\0".join(to_remove).encode()).hexdigest()
+    return zip_path.with_name(f"{zip_path.name}.extracted-{to_remove_hash[:16]}")
+
+
+def _get_extracted_zip_marker_path(extracted_path: Path) -> Path:
+    return extracted_path.with_name(f"{extracted_path.name}.complete")
+
+
+def _remove_stale_extracted_zips(zip_path: Path) -> None:
+    for stale_path in zip_path.parent.glob(f"{glob.escape(zip_path.name)}.extracted-*"):
+        if not stale_path.is_dir() or stale_path in _used_extracted_zip_paths:
+            continue
+
+        _get_extracted_zip_marker_path(stale_path).unlink(missing_ok=True)
+        shutil.rmtree(stale_path)
+        logging.info("Removed `%s`", stale_path)
+
+
+def _extract_cached_zip(
+    zip_path: Path, members: List[ZipInfo], to_remove: List[str], target_path: Path
+) -> None:
+    extracted_path = _get_extracted_zip_path(zip_path, to_remove)
+    extracted_marker_path = _get_extracted_zip_marker_path(extracted_path)
+    _used_extracted_zip_paths.add(extracted_path)
+
+    if extracted_marker_path.is_file():
+        logging.info("Reusing extracted zip file `%s`", extracted_path)
+    else:
+        _remove_stale_extracted_zips(zip_path)
+        shutil.rmtree(extracted_path, ignore_errors=True)
+        extracted_path.mkdir()
+        _extract_zip(zip_path, members, extracted_path)
+        extracted_marker_path.touch()
+
+    shutil.copytree(
+        extracted_path,
+        target_path,
+        copy_function=_link_or_copy_file,
+        dirs_exist_ok=True,
+    )
+    logging.info("Linked `%s` to `%s`", extracted_path, target_path)
 
 
 def _handle_zip(
@@ -32,62 +144,132 @@ def _handle_zip(
 ) -> None:
     try:
         with ZipFile(downloaded_file_path, "r") as zip_ref:
-            zip_contents = zip_ref.namelist()
-            is_single_file_zip = all("/" not in item for item in zip_contents)
-            is_non_root_zip = any(
-                keyword.lower() in zip_contents[0].lower()
-                for keyword in ["sd/", "sdout/"]
+            zip_members = zip_ref.infolist()
+
+        if len(zip_members) == 0:
+            return
+
+        root_folder = zip_members[0].filename.split("/", 1)[0] + "/"
+        is_non_root_zip = root_folder.lower() in _NON_ROOT_ZIP_FOLDERS
+        to_remove_prefixes = tuple(to_remove)
+        has_folders = False
+        extract_members: List[ZipInfo] = []
+
+        for member in zip_members:
+            has_folders = has_folders or "/" in member.filename
+
+            if member.filename.startswith(to_remove_prefixes):
+                continue
+
+            if is_non_root_zip:
+                if not member.filename.startswith(root_folder) or (
+                    member.filename == root_folder
+                ):
+                    continue
+
+                member.filename = member.filename[len(root_folder) :]
+
+            extract_members.append(member)
+
+        is_single_file_zip = not is_non_root_zip and not has_folders
+        target_path = save_path if is_single_file_zip else ROOT_SAVE_PATH
+
+        if downloaded_file_path.is_relative_to(DOWNLOADS_CACHE_PATH):
+            _extract_cached_zip(
+                downloaded_file_path, extract_members, to_remove, target_path
             )
-            filtered_zip_contents = None
-
-            if len(to_remove) > 0:
-                filtered_zip_contents = [
-                    filename
-                    for filename in zip_contents
-                    if not any(filename.startswith(prefix) for prefix in to_remove)
-                ]
-
-            if is_single_file_zip:
-                _extract_zip(zip_ref, filtered_zip_contents, save_path)
-            elif is_non_root_zip:
-                _extract_zip(zip_ref, filtered_zip_contents, DOWNLOADS_TEMP_PATH)
-
-                extracted_folder = DOWNLOADS_TEMP_PATH / zip_contents[0]
-                shutil.copytree(extracted_folder, ROOT_SAVE_PATH, dirs_exist_ok=True)
-
-                logging.info("`%s` moved to `%s`", extracted_folder, ROOT_SAVE_PATH)
-                shutil.rmtree(extracted_folder)
-            else:
-                _extract_zip(zip_ref, filtered_zip_contents, ROOT_SAVE_PATH)
+        else:
+            _extract_zip(downloaded_file_path, extract_members, target_path)
     except Exception as err:
         raise RuntimeError(f"Error while extracting the zip file: {err}") from err
 
 
+def _move_file_to(source_path: Path, target_path: Path) -> None:
+    try:
+        os.replace(source_path, target_path)
+    except OSError as err:
+        if err.errno != errno.EXDEV:
+            raise
+
+        shutil.move(source_path, target_path)
+
+    logging.info("Moved `%s` to `%s`", source_path, target_path)
+
+
+def _link_or_copy_file(
+    source_path: Union[str, Path], target_path: Union[str, Path]
+) -> None:
+    try:
+        os.unlink(target_path)
+    except FileNotFoundError:
+        pass
+
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copy2(source_path, target_path)
+
+
+def _save_downloaded_file(
+    downloaded_file_path: Path,
+    save_path: Path,
+    to_remove: List[str],
+    keep_source: bool,
+) -> None:
+    if downloaded_file_path.suffix == ".zip":
+        _handle_zip(downloaded_file_path, save_path, to_remove)
+    else:
+        save_path.mkdir(parents=True, exist_ok=True)
+        target_file_path = save_path / downloaded_file_path.name
+
+        if keep_source or downloaded_file_path.is_relative_to(DOWNLOADS_CACHE_PATH):
+            _link_or_copy_file(downloaded_file_path, target_file_path)
+            logging.info("Linked `%s` to `%s`", downloaded_file_path, target_file_path)
+        else:
+            _move_file_to(downloaded_file_path, target_file_path)
+
+
 def download_all(
-    section_list: List[Section], lock_list: List[DownloaderLock], token: Optional[str]
+    section_list: List[Section],
+    context: DownloadContext,
 ) -> None:
-    for section in section_list:
-        print(f"Downloading {section.id.name.lower()}:")
+    section_items = [
+        (section, item) for section in section_list for item in section.items
+    ]
 
-        for item in section.items:
-            try:
-                downloaded_file_path = item.downloader.download(lock_list, token)
-            except DownloadError as err:
-                save_downloads_lock(lock_list)
-                raise err
+    _OUTPUT.info("Downloading:")
+
+    remaining_uses = Counter(item.downloader for _, item in section_items)
+
+    executor = ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS)
+    futures: Dict[Downloader, Future[Optional[Path]]] = {}
+    for _, item in section_items:
+        if item.downloader not in futures:
+            futures[item.downloader] = executor.submit(
+                item.downloader.download, context
+            )
+
+    try:
+        current_section: Optional[Section] = None
 
-            save_path = SAVE_PATHS[section.id]
+        for section, item in section_items:
+            downloaded_file_path = futures[item.downloader].result()
+            remaining_uses[item.downloader] -= 1
 
             if downloaded_file_path is not None:
-                if downloaded_file_path.suffix == ".zip":
-                    _handle_zip(downloaded_file_path, save_path, item.to_remove)
-                else:
-                    save_path.mkdir(parents=True, exist_ok=True)
-                    target_file_path = save_path / downloaded_file_path.name
-                    shutil.copyfile(downloaded_file_path, target_file_path)
-                    logging.info(
-                        "Copied`%s` to `%s`", downloaded_file_path, target_file_path
-                    )
+                if section is not current_section:
+                    _OUTPUT.info("Saving %s:", section.id.name.lower())
+                    current_section = section
+
+                _OUTPUT.info("\t%s", downloaded_file_path.name)
+                _save_downloaded_file(
+                    downloaded_file_path,
+                    SAVE_PATHS[section.id],
+                    item.to_remove,
+                    remaining_uses[item.downloader] > 0,
+                )
+    finally:
+        executor.shutdown(cancel_futures=True)
 
 
 def move_file(
@@ -96,37 +278,66 @@ def move_file(
     target_path: Path,
     target_name: Optional[str] = None,
 ) -> None:
-    for file in source_path.iterdir():
-        if re.search(source_pattern, file.name) is not None:
-            new_path = target_path / (
-                target_name if target_name is not None else file.name
-            )
-            file.rename(new_path)
-            logging.info("Renamed `%s` to `%s`", file, new_path)
-            break
+    with os.scandir(source_path) as entries:
+        for entry in entries:
+            if re.search(source_pattern, entry.name) is not None:
+                new_path = target_path / (
+                    target_name if target_name is not None else entry.name
+                )
+                os.rename(entry.path, new_path)
+                logging.info("Renamed `%s` to `%s`", entry.path, new_path)
+                break
 
 
 def remove_from_root(to_remove: List[str]) -> None:
-    for item in to_remove:
-        item = ROOT_SAVE_PATH / item
-        if item.exists():
-            if item.is_dir():
-                shutil.rmtree(item)
-            elif item.is_file():
-                item.unlink()
-            logging.info("Removed `%s`", item)
+    item_paths: Set[Path] = set()
+
+    for item_path in sorted(
+        {ROOT_SAVE_PATH / item for item in to_remove}, key=lambda path: len(path.parts)
+    ):
+        if any(parent in item_paths for parent in item_path.parents):
+            continue
+        item_paths.add(item_path)
+
+        try:
+            item_mode = item_path.lstat().st_mode
+        except FileNotFoundError:
+            continue
+
+        if stat.S_ISDIR(item_mode):
+            shutil.rmtree(item_path)
+        else:
+            item_path.unlink()
+        logging.info("Removed `%s`", item_path)
 
 
 def move_nro_apps_into_folders() -> None:
     nro_apps_path = SAVE_PATHS[SectionId.NRO_APP]
-    if nro_apps_path is None:
+    if not nro_apps_path.is_dir():
         return
 
-    for item in nro_apps_path.iterdir():
-        if item.is_file() and item.suffix == ".nro":
-            folder = item.parent / item.stem
-            folder.mkdir(exist_ok=True)
-            item.rename(folder / item.name)
+    with os.scandir(nro_apps_path) as entries:
+        nro_entries = [
+            entry
+            for entry in entries
+            if entry.name.endswith(".nro") and entry.is_file()
+        ]
+
+    for entry in nro_entries:
+        folder = nro_apps_path / entry.name[: -len(".nro")]
+        folder.mkdir(exist_ok=True)
+        os.rename(entry.path, folder / entry.name)
+
+
+def _pack_folder(folder_path: Path, archive_name: str) -> None:
+    archive_path = Path(f"{archive_name}.zip")
+    archive_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with ZipFile(
+        archive_path, "w", ZIP_DEFLATED, compresslevel=_PACK_COMPRESS_LEVEL
+    ) as zip_file:
+        for path in sorted(folder_path.rglob("*")):
+            zip_file.write(path, path.relative_to(folder_path))
 
 
 def create_cli_parser() -> ArgumentParser:
@@ -136,6 +347,25 @@ def create_cli_parser() -> ArgumentParser:
             raise ArgumentTypeError(f"Invalid log level: `{level}`")
         return level
 
+    def valid_section_ids(section_names: str) -> Set[SectionId]:
+        try:
+            return {
+                get_section_id(section_name.strip())
+                for section_name in section_names.split(",")
+            }
+        except RuntimeError as err:
+            raise ArgumentTypeError(str(err)) from None
+
+    def valid_cache_ttl(seconds: str) -> float:
+        try:
+            cache_ttl = float(seconds)
+        except ValueError:
+            cache_ttl = -1
+
+        if cache_ttl < 0:
+            raise ArgumentTypeError(f"Invalid cache TTL: `{seconds}`")
+        return cache_ttl
+
     valid_log_levels = ", ".join(logging.getLevelNamesMapping().keys())
 
     cli_parser = ArgumentParser()
@@ -152,7 +382,24 @@ def create_cli_parser() -> ArgumentParser:
     cli_parser.add_argument(
         "--remove-cache", action="store_true", help="Delete previously downloaded files"
     )
+    cli_parser.add_argument(
+        "--cache-ttl",
+        type=valid_cache_ttl,
+        default=0,
+        help="Seconds to reuse cached API responses and files without revalidating (default 0)",
+    )
     cli_parser.add_argument("--pack", help="Name of the zip file to create")
+    section_group = cli_parser.add_mutually_exclusive_group()
+    section_group.add_argument(
+        "--only",
+        type=valid_section_ids,
+        help="Comma-separated list of the only sections to download",
+    )
+    section_group.add_argument(
+        "--skip",
+        type=valid_section_ids,
+        help="Comma-separated list of sections to skip",
+    )
     return cli_parser
 
 
@@ -164,6 +411,8 @@ def main() -> None:
         level=cli_args.log,
         format="[%(asctime)s %(levelname)s %(name)s] %(message)s",
     )
+    setup_output_logger()
+    set_cache_ttl(cli_args.cache_ttl)
 
     if ROOT_SAVE_PATH.exists():
         shutil.rmtree(ROOT_SAVE_PATH)
@@ -183,16 +432,42 @@ def main() -> None:
     DOWNLOADS_CACHE_PATH.mkdir(exist_ok=True)
     logging.info("Created `%s`", DOWNLOADS_CACHE_PATH)
 
-    downloads_section_list = parse_downloads_toml()
-    downloads_lock_list = parse_downloads_lock()
+    all_section_list = parse_downloads_toml()
+    downloads_section_list = [
+        section
+        for section in all_section_list
+        if (cli_args.only is None or section.id in cli_args.only)
+        and (cli_args.skip is None or section.id not in cli_args.skip)
+    ]
+    downloads_lock_index = parse_downloads_lock()
+    api_cache = parse_api_cache()
+    file_cache = parse_file_cache()
+    prune_file_cache(
+        file_cache,
+        {
+            url
+            for section in all_section_list
+            for item in section.items
+            if (url := item.downloader.file_cache_url()) is not None
+        },
+    )
     github_token = get_github_token()
-    download_all(downloads_section_list, downloads_lock_list, github_token)
-    save_downloads_lock(downloads_lock_list)
+
+    try:
+        download_all(
+            downloads_section_list,
+            DownloadContext(downloads_lock_index, api_cache, file_cache, github_token),
+        )
+    finally:
+        close_http_session()
+        save_downloads_lock(downloads_lock_index)
+        save_api_cache(api_cache)
+        save_file_cache(file_cache)
 
     if cli_args.mariko:
         move_file(
             ROOT_SAVE_PATH,
-            r"hekate_ctcaer_(?:\d+\.\d+\.\d+)\.bin",
+            _HEKATE_PAYLOAD_PATTERN,
             ROOT_SAVE_PATH,
             "payload.bin",
         )
@@ -200,9 +475,7 @@ def main() -> None:
     else:
         pc_payloads_path = PC_SAVE_PATH / "payloads"
         pc_payloads_path.mkdir(exist_ok=True)
-        move_file(
-            ROOT_SAVE_PATH, r"hekate_ctcaer_(?:\d+\.\d+\.\d+)\.bin", pc_payloads_path
-        )
+        move_file(ROOT_SAVE_PATH, _HEKATE_PAYLOAD_PATTERN, pc_payloads_path)
 
     move_nro_apps_into_folders()
 
@@ -210,11 +483,16 @@ def main() -> None:
         config_files_path: Path = BASE_PATH / "config_files"
 
         if config_files_path.exists():
-            shutil.copytree(config_files_path, ROOT_SAVE_PATH, dirs_exist_ok=True)
+            shutil.copytree(
+                config_files_path,
+                ROOT_SAVE_PATH,
+                copy_function=_link_or_copy_file,
+                dirs_exist_ok=True,
+            )
             logging.info("Copied `%s` to `%s`", config_files_path, ROOT_SAVE_PATH)
 
     if cli_args.pack is not None:
-        shutil.make_archive(cli_args.pack, "zip", ROOT_SAVE_PATH)
+        _pack_folder(ROOT_SAVE_PATH, cli_args.pack)
         logging.info(
             "The directory `%s` has been packed into `%s.zip`",
             ROOT_SAVE_PATH,
@@ -0,0 +1,14 @@
+import logging
+import sys
+
+OUTPUT_LOGGER_NAME = "output"
+
+
+def setup_output_logger() -> None:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    output_logger = logging.getLogger(OUTPUT_LOGGER_NAME)
+    output_logger.addHandler(handler)
+    output_logger.setLevel(logging.INFO)
+    output_logger.propagate = False
@@ -1,3 +1,6 @@
+import atexit
+import shutil
+from functools import lru_cache
 from pathlib import Path
 from tempfile import mkdtemp
 from typing import Dict
@@ -8,7 +11,8 @@ BASE_PATH: Path = Path.cwd()
 DOWNLOADS_TOML: Path = BASE_PATH / "downloads.toml"
 DOWNLOADS_LOCK: Path = BASE_PATH / "downloads.lock"
 DOWNLOADS_CACHE_PATH: Path = BASE_PATH / "downloads_cache"
-DOWNLOADS_TEMP_PATH: Path = Path(mkdtemp())
+API_CACHE: Path = DOWNLOADS_CACHE_PATH / "github_api.json"
+FILE_CACHE: Path = DOWNLOADS_CACHE_PATH / "files.json"
 GITHUB_TOKEN: Path = BASE_PATH / "github.token"
 ROOT_SAVE_PATH: Path = BASE_PATH / "sd"
 SAVE_PATHS: Dict[SectionId, Path] = {
@@ -21,3 +25,10 @@ SAVE_PATHS: Dict[SectionId, Path] = {
     SectionId.TEGRAEXPLORER_SCRIPT: ROOT_SAVE_PATH / "tegraexplorer/scripts",
 }
 PC_SAVE_PATH: Path = BASE_PATH / "pc"
+
+
+@lru_cache(maxsize=1)
+def get_downloads_temp_path() -> Path:
+    downloads_temp_path = Path(mkdtemp(prefix=".downloads_temp_", dir=BASE_PATH))
+    atexit.register(shutil.rmtree, downloads_temp_path, ignore_errors=True)
+    return downloads_temp_path
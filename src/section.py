@@ -5,13 +5,13 @@ from downloader import Downloader
 from section_id import SectionId
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SectionItem:
     downloader: Downloader
     to_remove: List[str]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Section:
     id: SectionId
     items: List[SectionItem]
@@ -11,18 +11,10 @@ class SectionId(Enum):
     TEGRAEXPLORER_SCRIPT = auto()
 
 
-_nameToSectionId = {
-    "bootloader": SectionId.BOOTLOADER,
-    "firmware": SectionId.FIRMWARE,
-    "payload": SectionId.PAYLOAD,
-    "nro_app": SectionId.NRO_APP,
-    "atmosphere_module": SectionId.ATMOSPHERE_MODULE,
-    "overlay": SectionId.OVERLAY,
-    "tegraexplorer_script": SectionId.TEGRAEXPLORER_SCRIPT,
-}
+_nameToSectionId = {section_id.name.lower(): section_id for section_id in SectionId}
 
 
-def get_section_id(section_name: str):
+def get_section_id(section_name: str) -> SectionId:
     result = _nameToSectionId.get(section_name)
     if result is None:
         raise RuntimeError(f"Unsupported section name: `{section_name}`")